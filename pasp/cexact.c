@@ -11,9 +11,9 @@
 bool setup_polynomial(array_bool_t (**Pn)[4], array_double_t (**K)[4], program_t *P) {
   size_t i;
 
-  *Pn = (array_bool_t(*)[4]) malloc(P->Q_n*sizeof(**Pn));
+  *Pn = (array_bool_t(*)[4]) calloc(P->Q_n, sizeof(**Pn));
   if (!(*Pn)) return false;
-  *K = (array_double_t(*)[4]) malloc(P->Q_n*sizeof(**K));
+  *K = (array_double_t(*)[4]) calloc(P->Q_n, sizeof(**K));
   if (!(*K)) return false;
 
   for (i = 0; i < P->Q_n; ++i)
@@ -24,6 +24,36 @@ bool setup_polynomial(array_bool_t (**Pn)[4], array_double_t (**K)[4], program_t
   return true;
 }
 
+void free_polynomial(array_bool_t (*Pn)[4], array_double_t (*K)[4], size_t Q_n) {
+  size_t i;
+  if (Pn) {
+    for (i = 0; i < Q_n; ++i) {
+      array_bool_free_contents(&Pn[i][0]); array_bool_free_contents(&Pn[i][1]);
+      array_bool_free_contents(&Pn[i][2]); array_bool_free_contents(&Pn[i][3]);
+    } free(Pn);
+  } if (K) {
+    for (i = 0; i < Q_n; ++i) {
+      array_double_free_contents(&K[i][0]); array_double_free_contents(&K[i][1]);
+      array_double_free_contents(&K[i][2]); array_double_free_contents(&K[i][3]);
+    } free(K);
+  }
+}
+
+/* Moves the polynomial terms accumulated in src into dst, leaving src empty (capacity is kept so
+ * the next batch does not reallocate). */
+bool merge_polynomial(array_bool_t (*Pn_dst)[4], array_double_t (*K_dst)[4],
+    array_bool_t (*Pn_src)[4], array_double_t (*K_src)[4], size_t Q_n) {
+  for (size_t i = 0; i < Q_n; ++i)
+    for (size_t j = 0; j < 4; ++j) {
+      array_bool_t *bs = &Pn_src[i][j], *bd = &Pn_dst[i][j];
+      array_double_t *ks = &K_src[i][j], *kd = &K_dst[i][j];
+      for (size_t l = 0; l < bs->n; ++l) if (!array_bool_append(bd, bs->d[l])) return false;
+      for (size_t l = 0; l < ks->n; ++l) if (!array_double_append(kd, ks->d[l])) return false;
+      array_bool_clear(bs); array_double_clear(ks);
+    }
+  return true;
+}
+
 bool setup_credal(double **L_CF, double **U_CF, double **X, program_t *P) {
   size_t i;
 
@@ -107,6 +137,191 @@ error:
 #define MODEL_CONTAINS_QUERY true
 #define MODEL_CONTAINS_EVI   false
 
+/* Upper bound on the length of a formatted target atom. */
+#define TARGET_HEAD_MAXLEN 64
+
+/* Appends the literals of A (with signs S_s) as body subgoals at s + cursor. */
+static bool append_target_body(char *s, size_t *cursor, clingo_symbol_t *A, uint8_t *S_s,
+    size_t n, bool *first) {
+  size_t j, k;
+  for (j = 0; j < n; ++j) {
+    if (!*first) { s[(*cursor)++] = ','; s[(*cursor)++] = ' '; }
+    *first = false;
+    if (S_s[j] == QUERY_TERM_NEG) { memcpy(s + *cursor, "not ", 4); *cursor += 4; }
+    if (!clingo_symbol_to_string_size(A[j], &k)) return false;
+    if (!clingo_symbol_to_string(A[j], s + *cursor, k)) return false;
+    *cursor += k-1;
+  }
+  return true;
+}
+
+/* Builds, for every query of qe, rules deriving fresh target atoms that encode the satisfaction
+ * conditions of the credal computation:
+ *
+ *   __query_qall(i) :- Q_i.    __query_qe(i) :- E_i, Q_i.    __query_pe(i) :- E_i, not __query_qall(i).
+ *
+ * A target atom is then a brave (resp. cautious) consequence of <P,θ> iff some (resp. every)
+ * stable model satisfies its body, which is exactly cond_2 and cond_4 (resp. cond_1 and cond_3),
+ * regardless of how many stable models there are. Rules whose bodies hold an undef literal are
+ * left out: they can never fire under total semantics. The rule text goes into qe->tgt_rules and
+ * the target atoms into qe->tgt_qe and qe->tgt_pe. */
+static bool add_target_rules(query_eval_t *qe) {
+  program_t *P = qe->P;
+  size_t i, j, n = 0, cursor = 0, k;
+  qe->tgt_qe = (clingo_symbol_t*) malloc(P->Q_n*sizeof(clingo_symbol_t));
+  qe->tgt_pe = (clingo_symbol_t*) malloc(P->Q_n*sizeof(clingo_symbol_t));
+  if (!(qe->tgt_qe && qe->tgt_pe)) goto nomem;
+  /* Measure an upper bound on the rule text: each literal shows up in at most two rules. */
+  for (i = 0; i < P->Q_n; ++i) {
+    query_t *q = P->Q + i;
+    for (j = 0; j < q->E_n; ++j) {
+      if (!clingo_symbol_to_string_size(q->E[j], &k)) return false;
+      n += 2*(k + 6);
+    }
+    for (j = 0; j < q->Q_n; ++j) {
+      if (!clingo_symbol_to_string_size(q->Q[j], &k)) return false;
+      n += 2*(k + 6);
+    }
+    n += 5*TARGET_HEAD_MAXLEN;
+  }
+  if (!n) return true;
+  qe->tgt_rules = (char*) malloc(n);
+  if (!qe->tgt_rules) goto nomem;
+  for (i = 0; i < P->Q_n; ++i) {
+    query_t *q = P->Q + i;
+    bool first;
+    clingo_symbol_t arg;
+    /* The target atoms are needed for the consequence test even when their rules are left out;
+     * build them directly instead of going through clingo's term parser. */
+    clingo_symbol_create_number((int) i, &arg);
+    if (!clingo_symbol_create_function("__query_qe", &arg, 1, true, &qe->tgt_qe[i])) return false;
+    if (!clingo_symbol_create_function("__query_pe", &arg, 1, true, &qe->tgt_pe[i])) return false;
+    if (qe->e_imp[i]) continue;
+    if (!qe->q_imp[i]) {
+      /* __query_qall(i) :- Q_i. */
+      cursor += sprintf(qe->tgt_rules + cursor, "__query_qall(%lu)", (unsigned long) i);
+      if (q->Q_n) {
+        memcpy(qe->tgt_rules + cursor, " :- ", 4); cursor += 4;
+        first = true;
+        if (!append_target_body(qe->tgt_rules, &cursor, q->Q, q->Q_s, q->Q_n, &first)) return false;
+      }
+      qe->tgt_rules[cursor++] = '.'; qe->tgt_rules[cursor++] = '\n';
+      /* __query_qe(i) :- E_i, Q_i. */
+      cursor += sprintf(qe->tgt_rules + cursor, "__query_qe(%lu)", (unsigned long) i);
+      if (q->E_n + q->Q_n) {
+        memcpy(qe->tgt_rules + cursor, " :- ", 4); cursor += 4;
+        first = true;
+        if (!append_target_body(qe->tgt_rules, &cursor, q->E, q->E_s, q->E_n, &first)) return false;
+        if (!append_target_body(qe->tgt_rules, &cursor, q->Q, q->Q_s, q->Q_n, &first)) return false;
+      }
+      qe->tgt_rules[cursor++] = '.'; qe->tgt_rules[cursor++] = '\n';
+    }
+    /* __query_pe(i) :- E_i, not __query_qall(i). */
+    cursor += sprintf(qe->tgt_rules + cursor, "__query_pe(%lu)", (unsigned long) i);
+    if (q->E_n || !qe->q_imp[i]) {
+      memcpy(qe->tgt_rules + cursor, " :- ", 4); cursor += 4;
+      first = true;
+      if (!append_target_body(qe->tgt_rules, &cursor, q->E, q->E_s, q->E_n, &first)) return false;
+      if (!qe->q_imp[i])
+        cursor += sprintf(qe->tgt_rules + cursor, "%snot __query_qall(%lu)", first ? "" : ", ",
+            (unsigned long) i);
+    }
+    qe->tgt_rules[cursor++] = '.'; qe->tgt_rules[cursor++] = '\n';
+  }
+  if (!cursor) { free(qe->tgt_rules); qe->tgt_rules = NULL; }
+  else qe->tgt_rules[cursor] = '\0';
+  return true;
+nomem:
+  PyErr_SetString(PyExc_MemoryError, "could not allocate memory for target rules!");
+  return false;
+}
+
+/* Sets the solver's enumeration mode ("auto", "brave" or "cautious") for the next solve call. */
+static bool set_enum_mode(clingo_control_t *C, const char *mode) {
+  clingo_configuration_t *cfg;
+  clingo_id_t cfg_root, cfg_sub;
+  if (!clingo_control_configuration(C, &cfg)) return false;
+  if (!clingo_configuration_root(cfg, &cfg_root)) return false;
+  if (!clingo_configuration_map_at(cfg, cfg_root, "solve.enum_mode", &cfg_sub)) return false;
+  return clingo_configuration_value_set(cfg, cfg_sub, mode);
+}
+
+/* Records which target atoms of qe appear in model M into in_qe and in_pe. Only the 2*Q_n target
+ * atoms are ever relevant, so probe those directly instead of materializing the (potentially much
+ * larger) consequence symbol set. */
+static bool model_target_consequences(const clingo_model_t *M, query_eval_t *qe, bool *in_qe,
+    bool *in_pe) {
+  size_t i, Q_n = qe->Q_n;
+  bool c;
+  for (i = 0; i < Q_n; ++i) {
+    if (!clingo_model_contains(M, qe->tgt_qe[i], &c)) return false;
+    in_qe[i] = c;
+    if (!clingo_model_contains(M, qe->tgt_pe[i], &c)) return false;
+    in_pe[i] = c;
+  }
+  return true;
+}
+
+/* Solves C under the given enumeration mode and collects, for each query of qe, whether its target
+ * atoms belong to the consequence fixpoint. When <P,θ> is unsatisfiable, sat is set to false and
+ * the membership arrays are left zeroed. */
+static bool solve_target_consequences(clingo_control_t *C, query_eval_t *qe, const char *mode,
+    bool *in_qe, bool *in_pe, bool *sat) {
+  bool ok = true;
+  clingo_solve_handle_t *handle;
+  clingo_solve_result_bitset_t res;
+  const clingo_model_t *M;
+  if (!set_enum_mode(C, mode)) return false;
+  memset(in_qe, 0, qe->Q_n); memset(in_pe, 0, qe->Q_n);
+  if (!clingo_control_solve(C, clingo_solve_mode_yield, NULL, 0, NULL, NULL, &handle))
+    return false;
+  while (true) {
+    if (!clingo_solve_handle_resume(handle)) goto error;
+    if (!clingo_solve_handle_model(handle, &M)) goto error;
+    if (!M) break;
+    /* Each yielded model refines the consequence set; the last one is the fixpoint. */
+    if (!model_target_consequences(M, qe, in_qe, in_pe)) goto error;
+  }
+  if (!clingo_solve_handle_get(handle, &res)) goto error;
+  *sat = res & clingo_solve_result_satisfiable;
+  goto close;
+error:
+  ok = false;
+close:
+  return clingo_solve_handle_close(handle) && ok;
+}
+
+/* Probes model M over the compiled atom table of qe, packing containment bits into bits. Each
+ * unique atom is probed exactly once, no matter how many query literals refer to it. */
+static inline bool model_query_bitset(const clingo_model_t *M, query_eval_t *qe, uint64_t *bits) {
+  size_t k, u;
+  bool c;
+  memset(bits, 0, qe->n_words*sizeof(uint64_t));
+  for (u = 0; u < qe->n; ++u) {
+    if (!clingo_model_contains(M, qe->atoms[u], &c)) return false;
+    if (c) for (k = qe->off[u]; k < qe->off[u+1]; ++k)
+      bits[qe->pos[k]/64] |= ((uint64_t) 1) << (qe->pos[k] % 64);
+  }
+  return true;
+}
+
+/* Whether every literal of the word-aligned span [w, w+l) agrees with its expected sign. */
+static inline bool query_span_sat(const uint64_t *bits, const uint64_t *sign_w,
+    const uint64_t *mask_w, size_t w, size_t l) {
+  for (size_t j = w; j < w+l; ++j) if ((bits[j] ^ sign_w[j]) & mask_w[j]) return false;
+  return true;
+}
+
+/* Tests whether a model already packed into bits satisfies all evidence (all_e) and all query
+ * terms (all_q) of the i-th query of qe. */
+static inline void eval_query_compiled(query_eval_t *qe, const uint64_t *bits, size_t i,
+    bool *all_e, bool *all_q) {
+  *all_e = !qe->e_imp[i]
+    && query_span_sat(bits, qe->sign_w, qe->mask_w, qe->woff_e[i], qe->wlen_e[i]);
+  *all_q = *all_e && !qe->q_imp[i]
+    && query_span_sat(bits, qe->sign_w, qe->mask_w, qe->woff_q[i], qe->wlen_q[i]);
+}
+
 bool model_contains(const clingo_model_t *M, query_t *q, size_t i, bool *c, bool query_or_evi, bool is_partial) {
   clingo_symbol_t x, x_u;
   uint8_t s;
@@ -197,8 +412,19 @@ void compute_total_choice(void *data) {
   size_t CF_n = P->CF_n;
   size_t Q_n = P->Q_n, Q_n_bytes = Q_n*sizeof(size_t);
   bool is_partial = P->sem, has_credal = P->CF_n;
-
-  if (!prepare_control(&C, P, theta, "0", false, NULL)) goto cleanup;
+  bool use_qe = st->qe && (st->qe->P == P);
+
+  if (control_reusable(P)) {
+    /* Ground only on the first total choice; every other one merely flips externals. */
+    if (!st->C && !prepare_reusable_control(&st->C, P, use_qe ? st->qe->tgt_rules : NULL,
+          &st->ext_lits)) goto cleanup;
+    C = st->C;
+    if (!assign_control_externals(C, P, theta, st->prev_valid ? &st->prev_theta : NULL,
+          st->ext_lits)) { st->prev_valid = false; goto cleanup; }
+    copy_total_choice(theta, &st->prev_theta);
+    st->prev_valid = true;
+  } else if (!prepare_control(&C, P, theta, "0", false, use_qe ? st->qe->tgt_rules : NULL))
+    goto cleanup;
 
   /* Zero-initialize counters and flags. */
   memset(cond_1, 0, Q_n); memset(cond_2, 0, Q_n);
@@ -206,7 +432,16 @@ void compute_total_choice(void *data) {
   memset(count_q_e, 0, Q_n_bytes);
   memset(count_e, 0, Q_n_bytes);
   memset(count_partial_q_e, 0, Q_n_bytes);
-  /* Start solving. */ {
+  if (use_qe) {
+    /* Two consequence solves decide cond_1..4 directly, no matter how large |Γ(θ)| is: a target
+     * atom is a brave (resp. cautious) consequence iff some (resp. every) stable model satisfies
+     * its rule body. */
+    bool sat;
+    if (!solve_target_consequences(C, st->qe, "brave", cond_2, cond_4, &sat)) goto cleanup;
+    if (sat) { if (!solve_target_consequences(C, st->qe, "cautious", cond_1, cond_3, &sat)) goto cleanup; }
+    /* The count checks below then reduce to the m = 0 (vacuous truth) case. */
+    m = sat;
+  } else /* Enumerate all stable models. */ {
     bool ok = true;
     clingo_solve_handle_t *handle;
     clingo_solve_result_bitset_t solve_ret;
@@ -229,16 +464,32 @@ void compute_total_choice(void *data) {
             if (!model_contains(M, q, j, &c, MODEL_CONTAINS_EVI, is_partial)) goto solve_error;
             if (!c) { all_e = false; break; }
           }
-          if (!all_e) continue;
-          /* all_q? - are all query symbols Q from query q in M? */
-          for (j = 0; j < q->Q_n; ++j) {
-            if (!model_contains(M, q, j, &c, MODEL_CONTAINS_QUERY, is_partial)) goto solve_error;
-            if (!c) { all_q = false; break; }
+          if (all_e) {
+            /* all_q? - are all query symbols Q from query q in M? */
+            for (j = 0; j < q->Q_n; ++j) {
+              if (!model_contains(M, q, j, &c, MODEL_CONTAINS_QUERY, is_partial)) goto solve_error;
+              if (!c) { all_q = false; break; }
+            }
           }
+          if (!all_e) continue;
           ++count_e[i];
           if (all_q) { cond_2[i] = true; ++count_q_e[i]; }
           else { cond_4[i] = true; ++count_partial_q_e[i]; }
         }
+        /* Stop enumerating once no further model can change the outcome: cond_2 and cond_4 only
+         * ever flip to true, and cond_1 (resp. cond_3) is dead as soon as some model fails to
+         * satisfy E and Q (resp. E and not Q), since they require every model to. */
+        bool done = true;
+        for (i = 0; i < Q_n; ++i)
+          if (!(cond_2[i] && cond_4[i] && (count_q_e[i] <= m) && (count_partial_q_e[i] <= m))) {
+            done = false;
+            break;
+          }
+        if (done) {
+          ++m;
+          if (!clingo_solve_handle_cancel(handle)) goto solve_error;
+          break;
+        }
       } else break;
     }
     if (!clingo_solve_handle_get(handle, &solve_ret)) goto solve_error;
@@ -263,8 +514,9 @@ solve_cleanup:
     /* Add probability ℙ(θ) according to model satisfiabilities. */
     if (has_credal) {
       size_t j;
+      /* Pn and K are local to this worker, so no synchronization is needed; partial polynomials
+       * are merged into a single one once the sweep over total choices is done. */
       if (cond_1[i] || cond_2[i] || cond_3[i] || cond_4[i]) {
-        pthread_mutex_lock(st->mu);
         if (cond_1[i]) {
           for (j = 0; j < CF_n; ++j) if (!array_bool_append(&Pn[i][0], CHOICE_IS_TRUE(theta, j))) goto cleanup;
           if (!array_double_append(&K[i][0], p)) goto cleanup;
@@ -278,7 +530,6 @@ solve_cleanup:
           for (j = 0; j < CF_n; ++j) if (!array_bool_append(&Pn[i][3], CHOICE_IS_TRUE(theta, j))) goto cleanup;
           if (!array_double_append(&K[i][3], p)) goto cleanup;
         }
-        pthread_mutex_unlock(st->mu);
       }
     } else {
       a[i] += cond_1[i]*p;
@@ -290,7 +541,7 @@ solve_cleanup:
 
   st->fail = false;
 cleanup:
-  clingo_control_free(C);
+  if (C != st->C) clingo_control_free(C);
   pthread_mutex_lock(st->wakeup);
   st->busy_procs[st->pid] = false;
   pthread_cond_signal(st->avail);
@@ -323,8 +574,16 @@ void compute_total_choice_maxent(void *data) {
 
   size_t Q_n = P->Q_n, Q_n_bytes = Q_n*sizeof(size_t);
   bool is_partial = P->sem;
+  bool use_qe = st->qe && (st->qe->P == P);
 
-  if (!prepare_control(&C, P, theta, "0", false, NULL)) goto cleanup;
+  if (control_reusable(P)) {
+    if (!st->C && !prepare_reusable_control(&st->C, P, NULL, &st->ext_lits)) goto cleanup;
+    C = st->C;
+    if (!assign_control_externals(C, P, theta, st->prev_valid ? &st->prev_theta : NULL,
+          st->ext_lits)) { st->prev_valid = false; goto cleanup; }
+    copy_total_choice(theta, &st->prev_theta);
+    st->prev_valid = true;
+  } else if (!prepare_control(&C, P, theta, "0", false, NULL)) goto cleanup;
 
   memset(count_q_e, 0, Q_n_bytes);
   memset(count_e, 0, Q_n_bytes);
@@ -341,19 +600,25 @@ void compute_total_choice_maxent(void *data) {
       if (!clingo_solve_handle_resume(handle)) goto solve_error;
       if (!clingo_solve_handle_model(handle, &M)) goto solve_error;
       if (M) {
+        if (use_qe && !model_query_bitset(M, st->qe, st->model_bits)) goto solve_error;
         for (i = 0; i < Q_n; ++i) {
           size_t j;
           query_t *q = (P->Q)+i;
           bool all_e = true, all_q = true, c;
-          for (j = 0; j < q->E_n; ++j) {
-            if (!model_contains(M, q, j, &c, MODEL_CONTAINS_EVI, is_partial)) goto solve_error;
-            if (!c) { all_e = false; break; }
+          if (use_qe) eval_query_compiled(st->qe, st->model_bits, i, &all_e, &all_q);
+          else {
+            for (j = 0; j < q->E_n; ++j) {
+              if (!model_contains(M, q, j, &c, MODEL_CONTAINS_EVI, is_partial)) goto solve_error;
+              if (!c) { all_e = false; break; }
+            }
+            if (all_e) {
+              for (j = 0; j < q->Q_n; ++j) {
+                if (!model_contains(M, q, j, &c, MODEL_CONTAINS_QUERY, is_partial)) goto solve_error;
+                if (!c) { all_q = false; break; }
+              }
+            }
           }
           if (!all_e) continue;
-          for (j = 0; j < q->Q_n; ++j) {
-            if (!model_contains(M, q, j, &c, MODEL_CONTAINS_QUERY, is_partial)) goto solve_error;
-            if (!c) { all_q = false; break; }
-          }
           ++count_e[i];
           if (all_q) ++count_q_e[i];
         }
@@ -376,7 +641,7 @@ solve_cleanup:
 
   st->fail = false;
 cleanup:
-  clingo_control_free(C);
+  if (C != st->C) clingo_control_free(C);
   pthread_mutex_lock(st->wakeup);
   st->busy_procs[st->pid] = false;
   pthread_cond_signal(st->avail);
@@ -389,6 +654,10 @@ bool exact_enum(program_t *P, double **R, bool lstable_sat, psemantics_t psem, b
   size_t Q_n = P->Q_n, i;
   size_t total_choice_n = get_num_facts(P);
   total_choice_t theta;
+  /* Per-worker polynomial accumulators: workers append terms lock-free and partial polynomials
+   * are merged after each sweep. */
+  array_bool_t (*Pn_w[NUM_PROCS])[4] = {NULL};
+  array_double_t (*K_w[NUM_PROCS])[4] = {NULL};
   array_bool_t (*Pn)[4] = NULL;
   array_double_t (*K)[4] = NULL;
   double *X, *L_CF, *U_CF = L_CF = X = NULL;
@@ -399,18 +668,41 @@ bool exact_enum(program_t *P, double **R, bool lstable_sat, psemantics_t psem, b
   pthread_mutex_t mu = PTHREAD_MUTEX_INITIALIZER, wakeup = PTHREAD_MUTEX_INITIALIZER;
   pthread_cond_t avail = PTHREAD_COND_INITIALIZER;
   void (*compute_func)(void*) = psem ? compute_total_choice_maxent : compute_total_choice;
+  bitvec_t gray_ctr = {0};
+  query_eval_t qe = {0};
+  /* Program solved under total semantics: P itself, or the stable companion a partial-semantics
+   * total choice may fall back onto. */
+  program_t *P_total = (P->sem == STABLE_SEMANTICS) ? P : P->stable;
 
   if (!init_total_choice(&theta, total_choice_n, P)) goto cleanup;
+  /* Step counter of the Gray code walk over total choices. */
+  if (!bitvec_init(&gray_ctr, total_choice_n)) goto cleanup;
+  bitvec_zeron(&gray_ctr, total_choice_n);
+  /* Compile the query literals once; workers share the table read-only. */
+  if (P_total) {
+    if (!init_query_eval(&qe, P_total)) goto cleanup;
+    /* Credal workers replace model enumeration with a brave/cautious consequence test over
+     * target atoms; build their rules once. */
+    if (psem == CREDAL_SEMANTICS && !add_target_rules(&qe)) goto cleanup;
+  }
 
   if (has_credal) {
     if (!setup_credal(&L_CF, &U_CF, &X, P)) goto cleanup;
-    if (!setup_polynomial(&Pn, &K, P)) goto cleanup;
+    for (i = 0; i < num_procs; ++i)
+      if (!setup_polynomial(&Pn_w[i], &K_w[i], P)) goto cleanup;
+    Pn = Pn_w[0]; K = K_w[0];
   }
 
-  for (i = 0; i < num_procs; ++i)
-    if (!init_storage(&S[i], P, Pn, K, i, busy_procs, &mu, &wakeup, &avail, lstable_sat,
+  for (i = 0; i < num_procs; ++i) {
+    if (!init_storage(&S[i], P, Pn_w[i], K_w[i], i, busy_procs, &mu, &wakeup, &avail, lstable_sat,
           total_choice_n, P->AD, P->AD_n))
       goto cleanup;
+    if (P_total) {
+      S[i].qe = &qe;
+      S[i].model_bits = (uint64_t*) malloc((qe.n_words ? qe.n_words : 1)*sizeof(uint64_t));
+      if (!S[i].model_bits) goto cleanup;
+    }
+  }
 
   for (i = 0; i < P->NR_n; ++i)
     if (!update_pr_neural_rule(&P->NR[i])) goto cleanup;
@@ -428,17 +720,25 @@ bool exact_enum(program_t *P, double **R, bool lstable_sat, psemantics_t psem, b
   *R = R_data;
   double *I = R_data;
   for (size_t ds = 0; ds < data_stride; ++ds) {
+    /* Seed the PF factor product; the Gray walk rescales it by the one flipped factor per step. */
+    theta.pr = prob_total_choice_pf(P, &theta);
     do {
       do {
         if (!dispatch_job(&theta, &wakeup, busy_procs, S, num_procs, pool, &avail, compute_func))
           goto cleanup;
       } while (incr_total_choice_ad(&theta, P));
-    } while (incr_total_choice(&theta));
+    } while (incr_total_choice_gray(&theta, &gray_ctr, P));
+    /* The Gray walk ends one flip away from zero; reset both for the next batch. */
+    bitvec_zeron(&theta.pf, total_choice_n);
+    bitvec_zeron(&gray_ctr, total_choice_n);
     thpool_wait(pool);
 
     for (i = 0; i < num_procs; ++i) warn |= S[i].warn;
 
-    if (!has_credal) {
+    if (has_credal) {
+      for (i = 1; i < num_procs; ++i)
+        if (!merge_polynomial(Pn, K, Pn_w[i], K_w[i], Q_n)) goto cleanup;
+    } else {
       a = S[0].a; b = S[0].b; c = S[0].c; d = S[0].d;
       for (i = 1; i < num_procs; ++i) {
         size_t j;
@@ -522,22 +822,14 @@ bool exact_enum(program_t *P, double **R, bool lstable_sat, psemantics_t psem, b
 cleanup:
   if (clingo_error_code() != clingo_error_success) raise_clingo_error(NULL);
   free_total_choice_contents(&theta);
+  bitvec_free_contents(&gray_ctr);
+  free_query_eval_contents(&qe);
   pthread_mutex_destroy(&mu); pthread_mutex_destroy(&wakeup); pthread_cond_destroy(&avail);
   thpool_destroy(pool);
   for (i = 0; i < num_procs; ++i) free_storage_contents(&S[i]);
   if (has_credal) {
     free(L_CF); free(U_CF); free(X);
-    if (Pn) {
-      for (i = 0; i < Q_n; ++i) {
-        array_bool_free_contents(&Pn[i][0]); array_bool_free_contents(&Pn[i][1]);
-        array_bool_free_contents(&Pn[i][2]); array_bool_free_contents(&Pn[i][3]);
-      } free(Pn);
-    } if (K) {
-      for (i = 0; i < Q_n; ++i) {
-        array_double_free_contents(&K[i][0]); array_double_free_contents(&K[i][1]);
-        array_double_free_contents(&K[i][2]); array_double_free_contents(&K[i][3]);
-      } free(K);
-    }
+    for (i = 0; i < num_procs; ++i) free_polynomial(Pn_w[i], K_w[i], Q_n);
   }
   return exact_num_ok;
 }
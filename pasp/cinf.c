@@ -2,17 +2,21 @@
 #include "cutils.h"
 #include <string.h>
 
-double prob_total_choice_prob(program_t *P, total_choice_t *theta) {
+double prob_total_choice_pf(program_t *P, total_choice_t *theta) {
   prob_fact_t *PF = P->PF;
-  size_t PF_n = P->PF_n, AD_n = P->AD_n, CF_n = P->CF_n;
-  size_t i = 0;
+  size_t PF_n = P->PF_n, CF_n = P->CF_n;
   double p = 1.0;
   bool t;
-  for (; i < PF_n; ++i) {
+  for (size_t i = 0; i < PF_n; ++i) {
     t = bitvec_GET(&theta->pf, i + CF_n);
     p *= t*PF[i].p + (!t)*(1.0-PF[i].p);
   }
-  for (i = 0; i < AD_n; ++i) p *= P->AD[i].P[theta->theta_ad[i]];
+  return p;
+}
+double prob_total_choice_prob(program_t *P, total_choice_t *theta) {
+  /* Reuse the PF factor product when the enumeration driver maintains it incrementally. */
+  double p = theta->pr < 0 ? prob_total_choice_pf(P, theta) : theta->pr;
+  for (size_t i = 0; i < P->AD_n; ++i) p *= P->AD[i].P[theta->theta_ad[i]];
   return p;
 }
 double prob_total_choice_neural(program_t *P, total_choice_t *theta, size_t offset, bool train) {
@@ -65,7 +69,11 @@ bool init_storage(storage_t *s, program_t *P, array_bool_t (*Pn)[4],
   s->busy_procs = busy_procs; s->lstable_sat = lstable_sat;
   s->pid = id;
   s->fail = s->warn = false;
+  s->C = NULL; s->ext_lits = NULL;
+  s->prev_valid = false;
+  s->qe = NULL; s->model_bits = NULL;
   if (!init_total_choice(&s->theta, total_choice_n, P)) goto error;
+  if (!init_total_choice(&s->prev_theta, total_choice_n, P)) goto error;
   return true;
 error:
   PyErr_SetString(PyExc_MemoryError, "could not allocate enough memory for init_storage!");
@@ -76,7 +84,11 @@ void free_storage_contents(storage_t *s) {
   free(s->cond_1); free(s->cond_2); free(s->cond_3); free(s->cond_4);
   free(s->count_q_e); free(s->count_e); free(s->count_partial_q_e);
   if (!s->P->CF_n) { free(s->a); free(s->b); free(s->c); free(s->d); }
+  if (s->C) clingo_control_free(s->C);
+  free(s->ext_lits);
+  free(s->model_bits);
   free_total_choice_contents(&s->theta);
+  free_total_choice_contents(&s->prev_theta);
 }
 
 bool setup_conds(bool **cond_1, bool **cond_2, bool **cond_3, bool **cond_4, size_t n) {
@@ -132,11 +144,109 @@ nomem:
   return false;
 }
 
+#define QUERY_EVAL_WORD_BITS 64
+/* Number of words of a word-aligned span of n literals. */
+static inline size_t query_eval_span(size_t n) {
+  return (n + QUERY_EVAL_WORD_BITS - 1)/QUERY_EVAL_WORD_BITS;
+}
+
+bool init_query_eval(query_eval_t *qe, program_t *P) {
+  size_t i, j, k, w, u, total = 0, n_words = 0;
+  clingo_symbol_t *atom_slot = NULL;
+  size_t *pos_slot = NULL, *uidx = NULL, *cnt = NULL;
+  qe->tgt_qe = qe->tgt_pe = NULL;
+  qe->tgt_rules = NULL;
+  for (i = 0; i < P->Q_n; ++i) {
+    total += P->Q[i].E_n + P->Q[i].Q_n;
+    n_words += query_eval_span(P->Q[i].E_n) + query_eval_span(P->Q[i].Q_n);
+  }
+  qe->atoms = (clingo_symbol_t*) malloc(total*sizeof(clingo_symbol_t));
+  qe->off = (size_t*) malloc((total+1)*sizeof(size_t));
+  qe->pos = (size_t*) malloc(total*sizeof(size_t));
+  qe->sign_w = (uint64_t*) calloc(n_words ? n_words : 1, sizeof(uint64_t));
+  qe->mask_w = (uint64_t*) calloc(n_words ? n_words : 1, sizeof(uint64_t));
+  qe->woff_e = (size_t*) malloc(P->Q_n*sizeof(size_t));
+  qe->wlen_e = (size_t*) malloc(P->Q_n*sizeof(size_t));
+  qe->woff_q = (size_t*) malloc(P->Q_n*sizeof(size_t));
+  qe->wlen_q = (size_t*) malloc(P->Q_n*sizeof(size_t));
+  qe->e_imp = (uint8_t*) calloc(P->Q_n ? P->Q_n : 1, sizeof(uint8_t));
+  qe->q_imp = (uint8_t*) calloc(P->Q_n ? P->Q_n : 1, sizeof(uint8_t));
+  atom_slot = (clingo_symbol_t*) malloc(total*sizeof(clingo_symbol_t));
+  pos_slot = (size_t*) malloc(total*sizeof(size_t));
+  uidx = (size_t*) malloc(total*sizeof(size_t));
+  cnt = (size_t*) calloc(total ? total : 1, sizeof(size_t));
+  if (!(qe->atoms && qe->off && qe->pos && qe->sign_w && qe->mask_w && qe->woff_e && qe->wlen_e
+        && qe->woff_q && qe->wlen_q && qe->e_imp && qe->q_imp && atom_slot && pos_slot && uidx
+        && cnt)) {
+    free(atom_slot); free(pos_slot); free(uidx); free(cnt);
+    free_query_eval_contents(qe);
+    PyErr_SetString(PyExc_MemoryError, "could not allocate memory for query compilation!");
+    return false;
+  }
+  for (i = k = w = 0; i < P->Q_n; ++i) {
+    query_t *q = P->Q + i;
+    qe->woff_e[i] = w; qe->wlen_e[i] = query_eval_span(q->E_n);
+    for (j = 0; j < q->E_n; ++j, ++k) {
+      atom_slot[k] = q->E[j];
+      pos_slot[k] = w*QUERY_EVAL_WORD_BITS + j;
+      qe->mask_w[w + j/QUERY_EVAL_WORD_BITS] |= ((uint64_t) 1) << (j % QUERY_EVAL_WORD_BITS);
+      if (q->E_s[j] == QUERY_TERM_POS)
+        qe->sign_w[w + j/QUERY_EVAL_WORD_BITS] |= ((uint64_t) 1) << (j % QUERY_EVAL_WORD_BITS);
+      else if (q->E_s[j] != QUERY_TERM_NEG) qe->e_imp[i] = true;
+    }
+    w += qe->wlen_e[i];
+    qe->woff_q[i] = w; qe->wlen_q[i] = query_eval_span(q->Q_n);
+    for (j = 0; j < q->Q_n; ++j, ++k) {
+      atom_slot[k] = q->Q[j];
+      pos_slot[k] = w*QUERY_EVAL_WORD_BITS + j;
+      qe->mask_w[w + j/QUERY_EVAL_WORD_BITS] |= ((uint64_t) 1) << (j % QUERY_EVAL_WORD_BITS);
+      if (q->Q_s[j] == QUERY_TERM_POS)
+        qe->sign_w[w + j/QUERY_EVAL_WORD_BITS] |= ((uint64_t) 1) << (j % QUERY_EVAL_WORD_BITS);
+      else if (q->Q_s[j] != QUERY_TERM_NEG) qe->q_imp[i] = true;
+    }
+    w += qe->wlen_q[i];
+  }
+  /* Deduplicate: atoms shared across literals (and queries) are probed once per model, with the
+   * bit positions of every literal referring to them grouped together. */
+  for (k = u = 0; k < total; ++k) {
+    for (j = 0; j < u; ++j) if (clingo_symbol_is_equal_to(atom_slot[k], qe->atoms[j])) break;
+    if (j == u) qe->atoms[u++] = atom_slot[k];
+    uidx[k] = j;
+    ++cnt[j];
+  }
+  qe->off[0] = 0;
+  for (j = 0; j < u; ++j) qe->off[j+1] = qe->off[j] + cnt[j];
+  memset(cnt, 0, (total ? total : 1)*sizeof(size_t));
+  for (k = 0; k < total; ++k) qe->pos[qe->off[uidx[k]] + cnt[uidx[k]]++] = pos_slot[k];
+  free(atom_slot); free(pos_slot); free(uidx); free(cnt);
+  qe->n = u;
+  qe->n_words = w;
+  qe->Q_n = P->Q_n;
+  qe->P = P;
+  return true;
+}
+
+void free_query_eval_contents(query_eval_t *qe) {
+  free(qe->atoms); free(qe->off); free(qe->pos);
+  free(qe->sign_w); free(qe->mask_w);
+  free(qe->woff_e); free(qe->wlen_e); free(qe->woff_q); free(qe->wlen_q);
+  free(qe->e_imp); free(qe->q_imp);
+  free(qe->tgt_qe); free(qe->tgt_pe); free(qe->tgt_rules);
+  qe->tgt_qe = qe->tgt_pe = NULL; qe->tgt_rules = NULL;
+  qe->atoms = NULL; qe->off = qe->pos = NULL;
+  qe->sign_w = qe->mask_w = NULL;
+  qe->woff_e = qe->wlen_e = qe->woff_q = qe->wlen_q = NULL;
+  qe->e_imp = qe->q_imp = NULL;
+  qe->n = qe->n_words = qe->Q_n = 0;
+  qe->P = NULL;
+}
+
 bool _init_total_choice(total_choice_t *theta, size_t n, size_t m) {
   if (!bitvec_init(&theta->pf, n)) return false;
   bitvec_zeron(&theta->pf, n);
   theta->ad_n = m;
   theta->theta_ad = (uint8_t*) calloc(m, sizeof(uint8_t));
+  theta->pr = -1.0;
   return true;
 }
 bool init_total_choice(total_choice_t *theta, size_t n, program_t *P) {
@@ -162,12 +272,38 @@ total_choice_t* copy_total_choice(total_choice_t *src, total_choice_t *dst) {
   } else dst->ad_n = src->ad_n;
   bitvec_copy(&src->pf, &dst->pf);
   if (src->ad_n > 0) memcpy(dst->theta_ad, src->theta_ad, src->ad_n*sizeof(uint8_t));
+  dst->pr = src->pr;
   return dst;
 }
 
 bool incr_total_choice(total_choice_t *theta) {
   return !theta->pf.n ? false : bitvec_incr(&theta->pf);
 }
+/**
+ * Advances theta's PF bits along a reflected Gray code walk, flipping exactly one bit per step so
+ * that consecutive total choices differ in a single fact. The binary step counter is kept in ctr
+ * (zeroed at the start of a sweep). When P is given and theta->pr is maintained, the PF factor
+ * product is rescaled by the single flipped factor instead of being recomputed per choice.
+ * Returns false once all 2^n choices have been visited.
+ */
+bool incr_total_choice_gray(total_choice_t *theta, bitvec_t *ctr, program_t *P) {
+  size_t j, n = theta->pf.n;
+  if (!n) return false;
+  /* The Gray bit flipped from step k to k+1 is the number of trailing ones of k. */
+  for (j = 0; (j < n) && bitvec_GET(ctr, j); ++j) bitvec_SET(ctr, j, false);
+  if (j == n) return false;
+  bitvec_SET(ctr, j, true);
+  bitvec_SET(&theta->pf, j, !bitvec_GET(&theta->pf, j));
+  if (P && (theta->pr >= 0) && (j >= P->CF_n) && (j < P->CF_n + P->PF_n)) {
+    double q = P->PF[j - P->CF_n].p;
+    bool t = bitvec_GET(&theta->pf, j);
+    double f_old = t ? 1.0-q : q;
+    /* A zero factor cannot be divided out; fall back to a full recomputation. */
+    if (f_old == 0) theta->pr = prob_total_choice_pf(P, theta);
+    else theta->pr *= (t ? q : 1.0-q)/f_old;
+  }
+  return true;
+}
 bool _incr_total_choice_ad(uint8_t *theta, annot_disj_t *ad, size_t i, size_t ad_n) {
   if (!ad_n) return true;
   if (i == ad_n-1) return (theta[i] = (theta[i] + 1) % ad[i].n) == 0;
@@ -450,6 +586,99 @@ bool prepare_control(clingo_control_t **C, program_t *P, total_choice_t *theta,
   return true;
 }
 
+bool control_reusable(program_t *P) {
+  /* Neural components rewrite rules per total choice and partial semantics may swap the program
+   * mid-sweep, so only plain stable-semantics programs qualify for grounding reuse. */
+  return P->sem == STABLE_SEMANTICS && !P->NR_n && !P->NA_n;
+}
+
+/* Number of externals of a reusable control for P. */
+static size_t count_externals(program_t *P) {
+  size_t n = P->CF_n + P->PF_n;
+  for (size_t i = 0; i < P->AD_n; ++i) n += P->AD[i].n;
+  return n;
+}
+
+/* Declare sym as an external (defaulting to false) in B, storing its program atom in a. */
+static inline bool backend_add_external(clingo_backend_t *B, clingo_symbol_t sym, clingo_atom_t *a) {
+  if (!clingo_backend_add_atom(B, &sym, a)) return false;
+  return clingo_backend_external(B, *a, clingo_external_type_false);
+}
+
+bool prepare_reusable_control(clingo_control_t **C, program_t *P, const char *append,
+    clingo_literal_t **lits) {
+  size_t i, j, e, ext_n = count_externals(P);
+  clingo_symbol_t *syms = NULL;
+  clingo_atom_t a;
+  clingo_backend_t *back = NULL;
+  const clingo_symbolic_atoms_t *sym_atoms;
+
+  *lits = NULL;
+  syms = (clingo_symbol_t*) malloc(ext_n*sizeof(clingo_symbol_t));
+  if (!syms) goto error;
+  *lits = (clingo_literal_t*) malloc(ext_n*sizeof(clingo_literal_t));
+  if (!(*lits)) goto error;
+
+  for (i = e = 0; i < P->CF_n; ++i) syms[e++] = P->CF[i].cl_f;
+  for (i = 0; i < P->PF_n; ++i) syms[e++] = P->PF[i].cl_f;
+  for (i = 0; i < P->AD_n; ++i)
+    for (j = 0; j < P->AD[i].n; ++j) syms[e++] = P->AD[i].cl_F[j];
+
+  if (!clingo_control_new(NULL, 0, undef_atom_ignore, NULL, 20, C)) goto error;
+  if (!setup_config(*C, "0", false)) goto error;
+  if (!clingo_control_add(*C, "base", NULL, 0, P->P)) goto error;
+  if (append) if (!clingo_control_add(*C, "base", NULL, 0, append)) goto error;
+  if (P->gr_P[0]) if (!clingo_control_add(*C, "base", NULL, 0, P->gr_P)) goto error;
+
+  /* Declare every probabilistic component as an external so each total choice amounts to an
+   * assignment instead of a reground. */
+  if (!clingo_control_backend(*C, &back)) goto error;
+  if (!clingo_backend_begin(back)) goto error;
+  for (e = 0; e < ext_n; ++e) if (!backend_add_external(back, syms[e], &a)) goto error;
+  if (!clingo_backend_end(back)) goto error;
+
+  /* Ground exactly once; subsequent total choices only flip externals. */
+  if (!clingo_control_ground(*C, GROUND_DEFAULT_PARTS, 1, NULL, NULL)) goto error;
+
+  /* Map the external atoms to their solver literals for assignment. */
+  if (!clingo_control_symbolic_atoms(*C, &sym_atoms)) goto error;
+  for (e = 0; e < ext_n; ++e) {
+    clingo_symbolic_atom_iterator_t it;
+    if (!clingo_symbolic_atoms_find(sym_atoms, syms[e], &it)) goto error;
+    if (!clingo_symbolic_atoms_literal(sym_atoms, it, &(*lits)[e])) goto error;
+  }
+
+  free(syms);
+  return true;
+error:
+  free(syms);
+  free(*lits);
+  *lits = NULL;
+  return false;
+}
+
+bool assign_control_externals(clingo_control_t *C, program_t *P, total_choice_t *theta,
+    total_choice_t *prev, clingo_literal_t *lits) {
+  size_t i, j, e;
+  size_t n = P->CF_n + P->PF_n;
+  /* When the previously assigned total choice is known, only flip the externals that changed;
+   * under the Gray code walk consecutive choices differ in a single fact. */
+  for (e = 0; e < n; ++e) {
+    bool t = CHOICE_IS_TRUE(theta, e);
+    if (prev && (CHOICE_IS_TRUE(prev, e) == t)) continue;
+    if (!clingo_control_assign_external(C, lits[e], t ?
+          clingo_truth_value_true : clingo_truth_value_false)) return false;
+  }
+  for (i = 0; i < P->AD_n; ++i) {
+    uint8_t u = theta->theta_ad[i];
+    if (prev && (prev->theta_ad[i] == u)) { e += P->AD[i].n; continue; }
+    for (j = 0; j < P->AD[i].n; ++j, ++e)
+      if (!clingo_control_assign_external(C, lits[e], (j == u) ?
+            clingo_truth_value_true : clingo_truth_value_false)) return false;
+  }
+  return true;
+}
+
 bool setup_config(clingo_control_t *C, const char *nmodels, bool parallelize_clingo) {
   clingo_configuration_t *cfg = NULL;
   clingo_id_t cfg_root, cfg_sub;
@@ -20,6 +20,9 @@ typedef struct {
   bitvec_t pf;
   size_t ad_n;
   uint8_t *theta_ad;
+  /* Product of the PF factors of this choice, maintained incrementally by the Gray code walk;
+   * negative when unknown, in which case it is computed from scratch (see prob_total_choice_pf). */
+  double pr;
 } total_choice_t;
 
 bool init_total_choice(total_choice_t *theta, size_t n, program_t *P);
@@ -27,14 +30,49 @@ void free_total_choice_contents(total_choice_t *theta);
 size_t get_num_facts(program_t *P);
 total_choice_t* copy_total_choice(total_choice_t *src, total_choice_t *dst);
 bool incr_total_choice(total_choice_t *theta);
+bool incr_total_choice_gray(total_choice_t *theta, bitvec_t *ctr, program_t *P);
 bool incr_total_choice_ad(total_choice_t *theta, program_t *P);
 void print_total_choice(total_choice_t *theta);
 
 double prob_total_choice(program_t *P, total_choice_t *theta);
+double prob_total_choice_pf(program_t *P, total_choice_t *theta);
 double prob_total_choice_prob(program_t *P, total_choice_t *theta);
 double prob_total_choice_neural(program_t *P, total_choice_t *theta, size_t offset, bool train);
 double prob_total_choice_ground(array_prob_fact_t *PF, total_choice_t *theta);
 
+/* Query literals flattened ("compiled") so the per-model satisfaction test works on packed
+ * bitsets: each model is probed once per table atom into a word of bits, and every query's
+ * evidence and query spans are then checked with word-wide XOR/AND compares against the expected
+ * sign bits. Only built for total-semantics programs; partial semantics keeps the query_t path
+ * (it also needs the _f auxiliary atoms). */
+typedef struct {
+  /* Program the table was compiled for. */
+  program_t *P;
+  /* Number of queries. */
+  size_t Q_n;
+  /* Unique atoms to probe on each model and their count; queries sharing atoms share probes. */
+  clingo_symbol_t *atoms;
+  size_t n;
+  /* Bit positions each unique atom occupies in the model bitset: atom i owns
+   * pos[off[i]..off[i+1]) (an atom shows up once per literal referring to it). */
+  size_t *off, *pos;
+  /* Number of words of the model bitset; evidence and query spans are word-aligned. */
+  size_t n_words;
+  /* Expected truth bit of each literal and which bits of each word are meaningful. */
+  uint64_t *sign_w, *mask_w;
+  /* First word and word length of each query's evidence and query spans. */
+  size_t *woff_e, *wlen_e, *woff_q, *wlen_q;
+  /* Spans holding an undef sign can never hold under total semantics. */
+  uint8_t *e_imp, *q_imp;
+  /* Target atoms __query_qe(i) and __query_pe(i) of the brave/cautious test, and the text of the
+   * rules deriving them (NULL when there are none); see add_target_rules in cexact.c. */
+  clingo_symbol_t *tgt_qe, *tgt_pe;
+  char *tgt_rules;
+} query_eval_t;
+
+bool init_query_eval(query_eval_t *qe, program_t *P);
+void free_query_eval_contents(query_eval_t *qe);
+
 typedef struct {
   bool *cond_1, *cond_2, *cond_3, *cond_4;
   size_t *count_q_e, *count_e, *count_partial_q_e;
@@ -47,6 +85,18 @@ typedef struct {
   size_t pid;
   pthread_mutex_t *mu, *wakeup;
   pthread_cond_t *avail;
+  /* Control grounded once and reused across total choices, with probabilistic components declared
+   * as externals (NULL when the program does not admit reuse - see control_reusable). */
+  clingo_control_t *C;
+  /* Solver literals of each external: CFs first, then PFs, then every head of every AD. */
+  clingo_literal_t *ext_lits;
+  /* Last total choice assigned to C, so only changed externals are reassigned. */
+  total_choice_t prev_theta;
+  bool prev_valid;
+  /* Compiled query table shared (read-only) by all workers; NULL when unavailable. */
+  query_eval_t *qe;
+  /* Per-worker scratch bitset (qe->n_words words) holding the current model's probed atoms. */
+  uint64_t *model_bits;
 } storage_t;
 
 bool init_storage(storage_t *s, program_t *P, array_bool_t (*Pn)[4],
@@ -89,4 +139,16 @@ bool setup_config(clingo_control_t *C, const char *nmodels, bool parallelize_cli
 bool has_total_model(program_t *P, total_choice_t *theta, bool *has);
 bool atomic_ground(clingo_control_t *C, clingo_ground_callback_t gcb, void *gdata);
 
+/* Whether a control grounded for P may be reused across total choices by flipping externals. */
+bool control_reusable(program_t *P);
+/* Create a control for P grounded exactly once, with CFs, PFs and AD heads declared as external
+ * atoms; their solver literals are returned in lits (of size CF_n + PF_n + sum of AD sizes). If
+ * append is non-NULL, it is added to the base program before grounding. */
+bool prepare_reusable_control(clingo_control_t **C, program_t *P, const char *append,
+    clingo_literal_t **lits);
+/* Assign the externals of a reusable control to the truth values given by theta. If prev is
+ * non-NULL, only the externals whose values differ from prev are reassigned. */
+bool assign_control_externals(clingo_control_t *C, program_t *P, total_choice_t *theta,
+    total_choice_t *prev, clingo_literal_t *lits);
+
 #endif